@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Inky photo frame entry point.
+
+Loads config, builds the photo sources and display, then loops forever:
+pick a photo, process it for e-paper, display it, sleep until the next
+refresh. SIGINT/SIGTERM shut down cleanly.
+"""
+
+import logging
+import signal
+import sys
+import threading
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+_shutdown_event = threading.Event()
+
+
+def signal_handler(signum, frame):
+    """Request a clean shutdown from SIGINT/SIGTERM."""
+    logger.info("Received signal %d, shutting down", signum)
+    _shutdown_event.set()
+
+
+def setup_logging(config: Config) -> None:
+    """Configure root logging, with colour when colorlog is available."""
+    try:
+        import colorlog
+    except ImportError:
+        colorlog = None
+
+    level = getattr(logging, config.logging.level.upper(), logging.INFO)
+    if colorlog is not None:
+        handler = colorlog.StreamHandler()
+        handler.setFormatter(
+            colorlog.ColoredFormatter(
+                "%(log_color)s%(asctime)s %(levelname)-8s%(reset)s %(name)s: %(message)s"
+            )
+        )
+        logging.basicConfig(level=level, handlers=[handler])
+    else:
+        logging.basicConfig(
+            level=level,
+            format="%(asctime)s %(levelname)-8s %(name)s: %(message)s",
+        )
+
+
+def process_next_photo(processor, photo_sources):
+    """Select and process the next photo; runs on the pipeline worker.
+
+    Re-selects on a per-photo failure (corrupt file, download error) so
+    one bad photo doesn't blank the cycle, and never lets an exception
+    escape to kill the main loop. Returns (path, image); image is None
+    when nothing displayable was found.
+    """
+    try:
+        if not photo_sources.has_photos():
+            return None, None
+        for _ in range(3):
+            photo_path = photo_sources.select_photo()
+            image = processor.process_file_cached(photo_path)
+            if image is not None:
+                return photo_path, image
+            logger.error("Processing failed for %s, re-selecting", photo_path)
+    except Exception:
+        logger.exception("Photo selection failed")
+    return None, None
+
+
+def display_next_photo(display, config, photo_sources, photo_path, image,
+                       force_full_refresh) -> bool:
+    """Display one already-processed photo. Returns True on success."""
+    if image is None:
+        if not photo_sources.has_photos():
+            logger.warning("No photos to display")
+            display.show_no_photos_message(config.photo.local_path)
+        else:
+            # Library has photos but this cycle produced nothing usable;
+            # keep the current image rather than showing a misleading
+            # placeholder for two full e-ink refreshes.
+            logger.warning("No displayable photo this cycle, skipping")
+        return False
+
+    logger.info("Displaying %s", photo_path)
+    display.update(image, force_full_refresh=force_full_refresh)
+    return True
+
+
+def main() -> int:
+    config = Config.load()
+    setup_logging(config)
+
+    # Deferred so config errors surface quickly and startup doesn't pay
+    # for the PIL/watchdog/inky import chain before it is needed.
+    from src.display_manager import DisplayManager, is_available
+    from src.photo_processor import PhotoProcessor
+    from src.photo_sources import create_photo_sources
+
+    errors = config.validate()
+    if errors:
+        for error in errors:
+            logger.error("Config error: %s", error)
+        return 1
+
+    if not is_available():
+        logger.warning("Inky hardware not detected, running in dry-run mode")
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    display = DisplayManager.get_instance(saturation=config.display.saturation)
+    processor = PhotoProcessor(
+        saturation=config.processing.saturation,
+        contrast=config.processing.contrast,
+        sharpness=config.processing.sharpness,
+        crop_bias=config.processing.crop_bias,
+    )
+    photo_sources = create_photo_sources(config)
+
+    logger.info(
+        "Photo frame started (%d photos, refresh every %ds)",
+        photo_sources.get_photo_count(),
+        config.display.refresh_interval,
+    )
+
+    refresh_interval = config.display.refresh_interval
+    # Full-refresh cadence (to clear ghosting) computed once, not re-read
+    # from display attributes on every photo.
+    full_refresh_every = display.resolution[1]
+    refresh_counter = 0
+
+    # Double-buffer: decode and process photo N+1 on a worker thread
+    # while the panel spends its ~30s pushing photo N.
+    from concurrent.futures import ThreadPoolExecutor
+
+    pipeline = ThreadPoolExecutor(max_workers=1)
+    future_next = pipeline.submit(process_next_photo, processor, photo_sources)
+    try:
+        while not _shutdown_event.is_set():
+            photo_path, image = future_next.result()
+            future_next = pipeline.submit(
+                process_next_photo, processor, photo_sources
+            )
+
+            force_full = refresh_counter % full_refresh_every == 0
+            refresh_counter += 1
+            display_next_photo(
+                display,
+                config,
+                photo_sources,
+                photo_path,
+                image,
+                force_full_refresh=force_full,
+            )
+
+            # One interruptible sleep: returns True immediately on shutdown
+            # instead of polling once a second.
+            if _shutdown_event.wait(timeout=refresh_interval):
+                break
+    finally:
+        pipeline.shutdown(wait=False, cancel_futures=True)
+        photo_sources.close()
+
+    logger.info("Shutdown complete")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
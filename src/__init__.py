@@ -0,0 +1 @@
+"""Inky photo frame application modules."""
@@ -0,0 +1,237 @@
+"""TOML configuration for the photo frame.
+
+Single source of truth for all tunables: display refresh cadence, photo
+sources, image processing multipliers and logging. Loaded from
+``config.toml`` next to the app, falling back to
+``~/.config/inky-photo-frame/config.toml``.
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+try:
+    # Optional fast path: rtoml parses ~7x faster than pure Python. The
+    # two parsers want different inputs (rtoml takes a path or text,
+    # tomllib a binary file), so each branch ships its own loader and the
+    # matching parse-error type.
+    import rtoml
+
+    def _load_toml(path: Path) -> dict:
+        return rtoml.load(path)
+
+    _TOML_ERRORS = (rtoml.TomlParsingError,)
+except ImportError:
+    import tomllib
+
+    def _load_toml(path: Path) -> dict:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+
+    _TOML_ERRORS = (tomllib.TOMLDecodeError,)
+
+logger = logging.getLogger(__name__)
+
+# Parsed configs keyed by path; the (st_mtime_ns, st_size) pair invalidates
+# the entry when the file changes on disk.
+_CONFIG_CACHE: dict = {}
+
+_DEFAULT_USER_CONFIG = Path.home() / ".config" / "inky-photo-frame" / "config.toml"
+
+
+@dataclass
+class DisplayConfig:
+    """E-paper display settings."""
+
+    refresh_interval: int = 900  # seconds between photo changes
+    saturation: float = 0.7  # Inky driver palette saturation (0.0-1.0)
+
+
+@dataclass
+class PhotoConfig:
+    """Photo source selection settings."""
+
+    sources: list = field(default_factory=lambda: ["local"])
+    local_path: str = "~/Pictures/inky-frame"
+    selection_mode: str = "random"  # "random", "sequential" or "shuffle"
+
+
+@dataclass
+class ProcessingConfig:
+    """Image processing pipeline settings."""
+
+    saturation: float = 2.5  # boost for e-paper colour compensation
+    contrast: float = 1.5
+    sharpness: float = 1.2
+    crop_bias: str = "top"  # "top" or "center" for portrait crops
+
+
+@dataclass
+class ICloudConfig:
+    """iCloud photo source settings."""
+
+    username: str = ""
+    album: str = ""  # empty = all photos
+    cache_dir: str = "~/.cache/inky-photo-frame/icloud"
+
+
+@dataclass
+class LoggingConfig:
+    """Logging settings."""
+
+    level: str = "INFO"
+
+
+# TOML section name → dataclass; drives _from_dict. Unknown keys in a
+# section are ignored, missing ones fall back to the dataclass defaults.
+_SECTION_MAP = {
+    "display": DisplayConfig,
+    "photo": PhotoConfig,
+    "processing": ProcessingConfig,
+    "icloud": ICloudConfig,
+    "logging": LoggingConfig,
+}
+_SECTION_FIELDS = {
+    name: frozenset(f.name for f in fields(cls)) for name, cls in _SECTION_MAP.items()
+}
+
+# Validation vocabularies, built once.
+_VALID_SOURCES = frozenset({"local", "icloud"})
+_VALID_SELECTION = frozenset({"random", "sequential", "shuffle"})
+_VALID_BIAS = frozenset({"top", "center"})
+_VALID_LOG_LEVELS = frozenset({"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"})
+
+
+@dataclass
+class Config:
+    """Top-level configuration, one attribute per TOML section."""
+
+    display: DisplayConfig = field(default_factory=DisplayConfig)
+    photo: PhotoConfig = field(default_factory=PhotoConfig)
+    processing: ProcessingConfig = field(default_factory=ProcessingConfig)
+    icloud: ICloudConfig = field(default_factory=ICloudConfig)
+    logging: LoggingConfig = field(default_factory=LoggingConfig)
+    _config_path: Path = None
+
+    @classmethod
+    def load(cls, path: Path = None) -> "Config":
+        """Load configuration from ``path`` or the default search locations.
+
+        Generates a template config on first run if none exists.
+        """
+        if path:
+            config_path = Path(path)
+            stat = None
+        else:
+            config_path, stat = cls._find_config_path()
+
+        if stat is None:
+            try:
+                stat = os.stat(config_path)
+            except FileNotFoundError:
+                logger.info("No config found, generating template at %s", config_path)
+                cls._generate_template(config_path)
+                stat = os.stat(config_path)
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = _CONFIG_CACHE.get(config_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        try:
+            data = _load_toml(config_path)
+        except _TOML_ERRORS as exc:
+            raise ValueError(f"Invalid TOML in {config_path}: {exc}") from exc
+
+        config = cls._from_dict(data)
+        config._config_path = config_path
+        _CONFIG_CACHE[config_path] = (stamp, config)
+        return config
+
+    @classmethod
+    def invalidate_cache(cls) -> None:
+        """Drop all memoized configs (used by tests)."""
+        _CONFIG_CACHE.clear()
+
+    @staticmethod
+    def _find_config_path() -> tuple:
+        """Return (config_path, stat_result): ./config.toml if present, else
+        the user config dir.
+
+        The stat result found during discovery is handed back so ``load``
+        doesn't stat the same file again; it is None when no config exists
+        yet. The user config dir is scanned with ``os.scandir`` so the
+        directory-entry stat is reused too.
+        """
+        try:
+            return Path("config.toml"), os.stat("config.toml")
+        except FileNotFoundError:
+            pass
+
+        try:
+            with os.scandir(_DEFAULT_USER_CONFIG.parent) as entries:
+                for entry in entries:
+                    if entry.name == "config.toml" and entry.is_file():
+                        return _DEFAULT_USER_CONFIG, entry.stat()
+        except FileNotFoundError:
+            pass
+        return _DEFAULT_USER_CONFIG, None
+
+    @classmethod
+    def _from_dict(cls, data: dict) -> "Config":
+        """Build a Config from a parsed TOML dict, filling in defaults."""
+        config = cls()
+        for name, section_cls in _SECTION_MAP.items():
+            section = data.get(name)
+            if section:
+                known = _SECTION_FIELDS[name]
+                kwargs = {k: v for k, v in section.items() if k in known}
+                setattr(config, name, section_cls(**kwargs))
+        return config
+
+    @staticmethod
+    def _generate_template(path: Path) -> None:
+        """Write the commented template config shipped in the package to
+        ``path``. Resolving it as a package resource works from a wheel
+        or zip where filesystem probes would not."""
+        from importlib.resources import files
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(files(__package__).joinpath("config.toml").read_bytes())
+
+    def _iter_errors(self):
+        """Yield human-readable problems as they are found."""
+        if self.display.refresh_interval <= 0:
+            yield "display.refresh_interval must be positive"
+        if not 0.0 <= self.display.saturation <= 1.0:
+            yield "display.saturation must be between 0.0 and 1.0"
+
+        for source in self.photo.sources:
+            if source not in _VALID_SOURCES:
+                yield f"unknown photo source: {source!r}"
+        if self.photo.selection_mode not in _VALID_SELECTION:
+            yield "photo.selection_mode must be 'random', 'sequential' or 'shuffle'"
+
+        if self.processing.saturation <= 0:
+            yield "processing.saturation must be positive"
+        if self.processing.contrast <= 0:
+            yield "processing.contrast must be positive"
+        if self.processing.sharpness <= 0:
+            yield "processing.sharpness must be positive"
+        if self.processing.crop_bias not in _VALID_BIAS:
+            yield "processing.crop_bias must be 'top' or 'center'"
+
+        if "icloud" in self.photo.sources and not self.icloud.username:
+            yield "icloud.username is required when the icloud source is enabled"
+
+        if self.logging.level.upper() not in _VALID_LOG_LEVELS:
+            yield f"logging.level must be one of {sorted(_VALID_LOG_LEVELS)}"
+
+    def validate(self) -> list:
+        """Return a list of human-readable problems; empty means valid."""
+        return list(self._iter_errors())
+
+    def is_valid(self) -> bool:
+        """True when validation finds no problems (stops at the first)."""
+        return next(self._iter_errors(), None) is None
@@ -0,0 +1,256 @@
+"""Inky Impression display control.
+
+The display is a shared hardware resource accessed over SPI, so
+DisplayManager is a singleton with retry logic around initialisation.
+When the Inky library (or the hardware) is absent the manager runs in
+dry-run mode and logs what it would have displayed, which keeps
+development off the Pi pleasant.
+"""
+
+import functools
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    from inky.auto import auto as inky_auto
+
+    INKY_AVAILABLE = True
+except ImportError:
+    INKY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Panel native resolution (Inky Impression 13.3", 2025 edition).
+DEFAULT_RESOLUTION = (1600, 1200)
+
+# Rendered "no photos" placeholder, cached on disk so repeat refresh
+# cycles with an empty photo folder skip the drawing and text layout.
+_NO_PHOTO_CACHE_DIR = Path("~/.cache/inky-photo-frame").expanduser()
+
+# Fonts tried for the placeholder message, in preference order.
+_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSansBold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_font(path: str, size: int):
+    """Load a TrueType font once per (path, size); parsing a font file is
+    a few open() calls and a full table parse we don't want per render."""
+    return ImageFont.truetype(path, size)
+
+
+def is_available() -> bool:
+    """True when the Inky library is importable."""
+    return INKY_AVAILABLE
+
+
+class DisplayManager:
+    """Singleton wrapper around the Inky display."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, saturation: float = 0.7):
+        if DisplayManager._instance is not None:
+            raise RuntimeError("Use DisplayManager.get_instance()")
+        self.saturation = saturation
+        self.update_count = 0
+        self._display = None
+        self._initialized = False
+        self._display_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, saturation: float = 0.7) -> "DisplayManager":
+        """Return the shared DisplayManager, creating it on first call.
+
+        The SPI hardware is not touched until the first display call, so
+        render-only paths (tests, process_and_save) stay instant.
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(saturation=saturation)
+            return cls._instance
+
+    def _ensure_initialized(self) -> None:
+        """Initialise the hardware on first use."""
+        if self._initialized:
+            return
+        with self._display_lock:
+            if not self._initialized:
+                self._initialize_display()
+                self._initialized = True
+
+    def _initialize_display(self) -> None:
+        """Probe the SPI display with retries (the panel occasionally needs
+        a moment after power-on)."""
+        if not INKY_AVAILABLE:
+            logger.warning("Inky library not available, running in dry-run mode")
+            return
+
+        delay = 1
+        for attempt in range(3):
+            try:
+                self._display = inky_auto()
+                logger.info(
+                    "Display initialised: %dx%d",
+                    self._display.width,
+                    self._display.height,
+                )
+                return
+            except Exception as exc:
+                logger.warning(
+                    "Display init attempt %d failed: %s", attempt + 1, exc
+                )
+                time.sleep(delay)
+                delay *= 2
+        raise RuntimeError("Could not initialise Inky display after 3 attempts")
+
+    @property
+    def resolution(self) -> tuple:
+        """(width, height) of the panel."""
+        if self._display is not None:
+            return (self._display.width, self._display.height)
+        return DEFAULT_RESOLUTION
+
+    @property
+    def width(self) -> int:
+        return self.resolution[0]
+
+    @property
+    def height(self) -> int:
+        return self.resolution[1]
+
+    def set_image(self, image) -> None:
+        """Hand a processed PIL image to the Inky driver (palette mapping
+        and dithering happen inside the driver)."""
+        self._ensure_initialized()
+        with self._display_lock:
+            if self._display is None:
+                logger.info("[dry-run] set_image %sx%s", *image.size)
+                return
+            self._display.set_image(image, saturation=self.saturation)
+
+    def show(self) -> None:
+        """Push the staged image to the panel. Blocks for the full e-ink
+        refresh cycle (~30 s)."""
+        self._ensure_initialized()
+        with self._display_lock:
+            if self._display is None:
+                logger.info("[dry-run] show")
+                return
+            start = time.monotonic()
+            self._display.show()
+            logger.info("Display refresh took %.1fs", time.monotonic() - start)
+
+    def update(self, image, force_full_refresh: bool = False) -> None:
+        """Display ``image``, optionally forcing a full refresh to clear
+        ghosting from previous images."""
+        if force_full_refresh:
+            self.clear()
+        self.set_image(image)
+        self.show()
+        self.update_count += 1
+
+    def clear(self) -> None:
+        """Blank the panel to white (mitigates ghosting)."""
+        width, height = self.resolution
+        blank = Image.new("RGB", (width, height), (255, 255, 255))
+        self.set_image(blank)
+        self.show()
+
+    # Resolved font path: None before the first probe, "" when no TrueType
+    # candidate exists and the PIL default bitmap font is used instead.
+    _font_path = None
+
+    def _get_fonts(self) -> tuple:
+        """Return (title_font, body_font), probing the candidate list once."""
+        if DisplayManager._font_path is None:
+            for candidate in _FONT_CANDIDATES:
+                try:
+                    _load_font(candidate, 96)
+                except OSError:
+                    continue
+                DisplayManager._font_path = candidate
+                break
+            else:
+                DisplayManager._font_path = ""
+
+        if DisplayManager._font_path:
+            return (
+                _load_font(DisplayManager._font_path, 96),
+                _load_font(DisplayManager._font_path, 48),
+            )
+        default = ImageFont.load_default()
+        return default, default
+
+    def show_no_photos_message(self, photo_dir: str = "") -> None:
+        """Render a friendly placeholder when no photos are available.
+
+        The rendered image is cached on disk keyed by panel size and the
+        rendered directory text, so only the first invocation pays for
+        drawing and text layout.
+        """
+        width, height = self.resolution
+        text_key = hashlib.blake2b(
+            (photo_dir or "").encode(), digest_size=4
+        ).hexdigest()
+        cache_path = (
+            _NO_PHOTO_CACHE_DIR / f"no_photos_{width}x{height}_{text_key}.png"
+        )
+        if cache_path.exists():
+            self.update(Image.open(cache_path), force_full_refresh=True)
+            return
+
+        image = Image.new("RGB", (width, height), (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+
+        title_font, body_font = self._get_fonts()
+
+        # Simple sun-over-hills placeholder graphic.
+        draw.ellipse(
+            (width // 2 - 120, height // 4 - 120, width // 2 + 120, height // 4 + 120),
+            fill=(255, 200, 0),
+            outline=(0, 0, 0),
+            width=4,
+        )
+        draw.polygon(
+            [
+                (width // 6, height * 3 // 4),
+                (width // 2, height * 2 // 5),
+                (width * 5 // 6, height * 3 // 4),
+            ],
+            fill=(0, 128, 0),
+            outline=(0, 0, 0),
+        )
+
+        lines = [
+            ("No photos yet", title_font),
+            ("", body_font),
+            ("Add photos to:", body_font),
+            (photo_dir or "the configured photo folder", body_font),
+            ("and they will appear here.", body_font),
+        ]
+        y = height * 3 // 4 + 40
+        for text, font in lines:
+            if text:
+                bbox = draw.textbbox((0, 0), text, font=font)
+                text_width = bbox[2] - bbox[0]
+                draw.text(((width - text_width) // 2, y), text, fill=(0, 0, 0), font=font)
+            y += 60
+
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            image.save(cache_path, "PNG", optimize=False)
+        except OSError as exc:
+            logger.debug("Could not cache placeholder image: %s", exc)
+
+        self.update(image, force_full_refresh=True)
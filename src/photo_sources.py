@@ -0,0 +1,791 @@
+"""Photo sources with a unified interface.
+
+Two concrete sources today — a watched local folder and iCloud Photos —
+plus a composite that presents several sources as one pool. New sources
+only need to subclass PhotoSource and implement refresh().
+"""
+
+import atexit
+import bisect
+import collections
+import functools
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+try:
+    # Optional: SortedList keeps inserts/removals at O(log n) instead of
+    # the O(n) element shuffle a plain list pays on every insort.
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+logger = logging.getLogger(__name__)
+
+
+def _sorted_index(paths) -> "list | SortedList":
+    """Build the sorted photo container (SortedList when available)."""
+    return sorted(paths) if SortedList is None else SortedList(paths)
+
+# Filesystems where inotify silently drops events; watch these by polling.
+_POLLING_FSTYPES = frozenset({"cifs", "smb3", "nfs", "nfs4", "fuse.sshfs"})
+
+
+def _needs_polling(path: Path) -> bool:
+    """True when ``path`` sits on a filesystem whose native watcher is
+    unreliable (network mounts don't generate inotify events)."""
+    try:
+        resolved = str(path.resolve())
+        fstype = ""
+        best = -1
+        with open("/proc/mounts") as mounts:
+            for line in mounts:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mountpoint = parts[1]
+                # Component-wise prefix match: /mnt/photos must not claim
+                # a directory on /mnt/photos2.
+                if (
+                    resolved == mountpoint
+                    or resolved.startswith(mountpoint.rstrip("/") + "/")
+                ) and len(mountpoint) > best:
+                    fstype = parts[2]
+                    best = len(mountpoint)
+        return fstype in _POLLING_FSTYPES
+    except OSError:
+        return False
+
+SUPPORTED_EXTENSIONS = frozenset(
+    {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".heic", ".heif", ".webp"}
+)
+
+# Tuple form for str.endswith, which compares all suffixes in one C call.
+SUPPORTED_EXTENSIONS_TUPLE = tuple(sorted(SUPPORTED_EXTENSIONS))
+
+# Both casings precomputed once so the overwhelmingly common all-lower
+# (img_1234.jpg) and all-upper (IMG_1234.JPG) names match without
+# allocating a lowercased copy of every name during the scan.
+_CASED_EXTENSIONS = SUPPORTED_EXTENSIONS_TUPLE + tuple(
+    ext.upper() for ext in SUPPORTED_EXTENSIONS_TUPLE
+)
+
+
+def _is_photo_name(name: str) -> bool:
+    """True when ``name`` has a supported photo extension."""
+    return name.endswith(_CASED_EXTENSIONS) or name.lower().endswith(
+        SUPPORTED_EXTENSIONS_TUPLE
+    )
+
+
+# Byte budget for the in-memory cache of recently loaded photo files.
+_LOAD_CACHE_BUDGET = 64 * 1024 * 1024
+
+
+class SelectionMode(Enum):
+    RANDOM = "random"
+    SEQUENTIAL = "sequential"
+    SHUFFLE = "shuffle"
+
+
+class PhotoSource(ABC):
+    """Base class for photo sources."""
+
+    def __init__(self, selection_mode: SelectionMode = SelectionMode.RANDOM):
+        self.selection_mode = selection_mode
+        self._photos: list = []
+        self._index = 0
+        self._rng = random.Random()
+        self._shuffle_order: list = []
+        self._byte_cache = collections.OrderedDict()
+        self._byte_cache_size = 0
+
+    @abstractmethod
+    def refresh(self) -> None:
+        """Rebuild the internal photo list."""
+
+    def get_photo_count(self) -> int:
+        return len(self._photos)
+
+    def has_photos(self) -> bool:
+        return self.get_photo_count() > 0
+
+    def select_photo_index(self) -> int:
+        """Pick the next photo index according to the selection mode."""
+        count = self.get_photo_count()
+        if count == 0:
+            raise IndexError("No photos available")
+        if self.selection_mode == SelectionMode.SEQUENTIAL:
+            index = self._index % count
+            self._index += 1
+            return index
+        if self.selection_mode == SelectionMode.SHUFFLE:
+            # Cycle a pre-shuffled permutation: every photo shows once per
+            # cycle, unlike independent uniform draws which repeat early.
+            if len(self._shuffle_order) != count or self._index >= count:
+                self._shuffle_order = self._rng.sample(range(count), count)
+                self._index = 0
+            index = self._shuffle_order[self._index]
+            self._index += 1
+            return index
+        return self._rng.randrange(count)
+
+    def get_photo_path(self, index: int) -> Path:
+        """Return a local filesystem path for the photo at ``index``."""
+        return self._photos[index]
+
+    def select_photo(self) -> Path:
+        """Pick the next photo and return its local path."""
+        return self.get_photo_path(self.select_photo_index())
+
+    def load_photo(self, path: Path) -> bytes:
+        """Read a photo's raw bytes, via a small in-memory LRU.
+
+        A slideshow cycling a fixed pool re-reads the same files over and
+        over; the cache is bounded by bytes, not entries, and keyed on
+        (path, mtime, size) so edits invalidate automatically.
+        """
+        stat = os.stat(path)
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        data = self._byte_cache.get(key)
+        if data is not None:
+            self._byte_cache.move_to_end(key)
+            return data
+
+        data = path.read_bytes()
+        if len(data) <= _LOAD_CACHE_BUDGET:
+            self._byte_cache[key] = data
+            self._byte_cache_size += len(data)
+            while self._byte_cache_size > _LOAD_CACHE_BUDGET:
+                _, evicted = self._byte_cache.popitem(last=False)
+                self._byte_cache_size -= len(evicted)
+        return data
+
+    def close(self) -> None:
+        """Release any resources held by the source; safe to call twice."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# How long to collect a burst of file events before applying it.
+_DEBOUNCE_SECONDS = 0.5
+
+
+class _PhotoFileHandler(FileSystemEventHandler):
+    """Buffers watchdog events and flushes them to the source in batches.
+
+    Bulk-copying a folder of photos produces an event storm; coalescing
+    the burst behind a short timer applies it in one pass instead of
+    waking the index once per file.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+
+    def _schedule(self, event):
+        with self._lock:
+            self._pending.append(event)
+            if self._timer is None:
+                self._timer = threading.Timer(_DEBOUNCE_SECONDS, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            events, self._pending = self._pending, []
+            self._timer = None
+        self.source._queue_events(events)
+
+    def cancel(self):
+        """Drop any pending events and stop the flush timer."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+            self._pending = []
+        if timer is not None:
+            timer.cancel()
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._schedule(event)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._schedule(event)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._schedule(event)
+
+
+class LocalPhotoSource(PhotoSource):
+    """Photos from a local directory, kept fresh via watchdog."""
+
+    def __init__(
+        self,
+        path: str,
+        selection_mode: SelectionMode = SelectionMode.RANDOM,
+        watch: bool = True,
+        observer_backend: str = "auto",
+    ):
+        super().__init__(selection_mode)
+        self.path = Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.observer_backend = observer_backend
+        self._observer = None
+        self._handler = None
+        self._open_index()
+        snapshot = self._load_index()
+        if snapshot:
+            # Serve the persisted index immediately; verify it against the
+            # filesystem in the background so a 50k-photo library on an SD
+            # card doesn't block startup on a full walk.
+            self._photos = _sorted_index(snapshot)
+            threading.Thread(target=self.refresh, daemon=True).start()
+        else:
+            self.refresh()
+        # Index updates run on one dedicated worker so neither the
+        # watchdog observer thread nor the debounce timer ever blocks on
+        # index work (a backed-up observer loses kernel events).
+        self._events_cond = threading.Condition()
+        self._pending_events = []
+        self._worker_stop = False
+        self._worker = threading.Thread(target=self._apply_loop, daemon=True)
+        self._worker.start()
+        if watch:
+            self._start_watching()
+        # Explicit shutdown instead of __del__: joining the observer
+        # thread from a finalizer at interpreter exit can hang or raise.
+        atexit.register(self.close)
+
+    def _queue_events(self, events) -> None:
+        with self._events_cond:
+            self._pending_events.extend(events)
+            self._events_cond.notify()
+
+    def _apply_loop(self) -> None:
+        while True:
+            with self._events_cond:
+                while not self._pending_events and not self._worker_stop:
+                    self._events_cond.wait()
+                if self._worker_stop:
+                    return
+                events, self._pending_events = self._pending_events, []
+            for event in events:
+                self._apply_event(event)
+
+    def _open_index(self) -> None:
+        """Open (or create) the on-disk photo index next to the photos."""
+        self._db = None
+        self._db_lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(
+                self.path / ".inky-index.sqlite", check_same_thread=False
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS photos (path TEXT PRIMARY KEY, mtime REAL)"
+            )
+        except sqlite3.Error as exc:
+            # Read-only photo dirs can't host an index; scan every start.
+            logger.debug("Photo index unavailable: %s", exc)
+            self._db = None
+
+    def _load_index(self) -> list:
+        if self._db is None:
+            return []
+        with self._db_lock:
+            return sorted(p for (p,) in self._db.execute("SELECT path FROM photos"))
+
+    def refresh(self) -> None:
+        """Rescan the photo directory and sync the on-disk index."""
+        scanned = dict(self._scan(str(self.path)))
+        if self._db is not None:
+            with self._db_lock:
+                stored = dict(self._db.execute("SELECT path, mtime FROM photos"))
+                changed = [
+                    (p, m) for p, m in scanned.items() if stored.get(p) != m
+                ]
+                removed = [(p,) for p in stored.keys() - scanned.keys()]
+                if changed or removed:
+                    with self._db:
+                        self._db.executemany(
+                            "INSERT OR REPLACE INTO photos VALUES (?, ?)", changed
+                        )
+                        self._db.executemany(
+                            "DELETE FROM photos WHERE path = ?", removed
+                        )
+        self._photos = _sorted_index(scanned)
+        self._shuffle_order = []
+        logger.debug("Local source: %d photos in %s", len(self._photos), self.path)
+
+    @staticmethod
+    def _scan(root: str) -> list:
+        """Walk ``root`` with os.scandir, returning (path, mtime) tuples.
+
+        scandir reuses the directory entry's type information and cached
+        stat, and allocates no Path objects; paths are wrapped in Path
+        lazily by get_photo_path.
+        """
+        photos = []
+        stack = [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and _is_photo_name(
+                            entry.name
+                        ):
+                            photos.append(
+                                (entry.path, entry.stat(follow_symlinks=False).st_mtime)
+                            )
+            except OSError as exc:
+                logger.debug("Skipping unreadable directory: %s", exc)
+        return photos
+
+    def _apply_event(self, event) -> None:
+        """Apply one watchdog event to the sorted photo list.
+
+        A single bisect insert/remove per event instead of rescanning the
+        whole tree, which matters when photos are bulk-copied in. refresh()
+        remains the fallback if the index ever drifts.
+        """
+        if event.event_type == "created":
+            self._add_photo(event.src_path)
+        elif event.event_type == "deleted":
+            self._remove_photo(event.src_path)
+        elif event.event_type == "moved":
+            self._remove_photo(event.src_path)
+            self._add_photo(event.dest_path)
+
+    def _add_photo(self, raw_path: str) -> None:
+        if not _is_photo_name(raw_path):
+            return
+        if SortedList is not None:
+            if raw_path not in self._photos:
+                self._photos.add(raw_path)
+            return
+        i = bisect.bisect_left(self._photos, raw_path)
+        if i == len(self._photos) or self._photos[i] != raw_path:
+            self._photos.insert(i, raw_path)
+
+    def _remove_photo(self, raw_path: str) -> None:
+        if SortedList is not None:
+            self._photos.discard(raw_path)
+            return
+        i = bisect.bisect_left(self._photos, raw_path)
+        if i < len(self._photos) and self._photos[i] == raw_path:
+            self._photos.pop(i)
+
+    def get_photo_path(self, index: int) -> Path:
+        """Return a local filesystem path for the photo at ``index``."""
+        return Path(self._photos[index])
+
+    def _start_watching(self) -> None:
+        if self.observer_backend == "polling" or (
+            self.observer_backend == "auto" and _needs_polling(self.path)
+        ):
+            logger.info("Using polling observer for %s", self.path)
+            observer_cls = PollingObserver
+        else:
+            observer_cls = Observer
+
+        self._handler = _PhotoFileHandler(self)
+        self._observer = observer_cls()
+        self._observer.schedule(self._handler, str(self.path), recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+        logger.info("Watching %s for new photos", self.path)
+
+    def stop_watching(self) -> None:
+        if self._handler is not None:
+            self._handler.cancel()
+            self._handler = None
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+    def close(self) -> None:
+        """Stop watching and close the on-disk index; safe to call twice."""
+        self.stop_watching()
+        with self._events_cond:
+            self._worker_stop = True
+            self._events_cond.notify()
+        if self._worker.is_alive():
+            self._worker.join(timeout=2)
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# How long the cached iCloud photo list stays fresh before re-paginating
+# the library.
+_ICLOUD_METADATA_TTL = 6 * 3600
+
+
+class _CachedPhoto:
+    """Lazy stand-in for a pyicloud PhotoAsset loaded from the metadata
+    cache; the real asset is only resolved when a download is needed."""
+
+    __slots__ = ("_source", "id", "filename", "url", "size")
+
+    def __init__(self, source, photo_id, filename, url=None, size=None):
+        self._source = source
+        self.id = photo_id
+        self.filename = filename
+        self.url = url
+        self.size = size
+
+    def download(self):
+        return self._source._get_asset(self.id).download()
+
+
+class ICloudPhotoSource(PhotoSource):
+    """Photos from iCloud, downloaded to a local cache before display.
+
+    Requires an Apple ID with Advanced Data Protection disabled. 2FA is
+    interactive on first run; the session is then stored for ~2 months.
+    Apple throttles downloads to roughly one photo per 30 seconds, so the
+    cache matters.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        album: str = "",
+        cache_dir: str = "~/.cache/inky-photo-frame/icloud",
+        selection_mode: SelectionMode = SelectionMode.RANDOM,
+    ):
+        super().__init__(selection_mode)
+        self.username = username
+        self.album = album
+        self.cache_path = Path(cache_dir).expanduser()
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        # Downloads are network-bound; a small pool warms the cache for
+        # upcoming photos while the panel refreshes. Per-photo locks stop
+        # a prefetch and a foreground miss downloading the same file twice.
+        self._prefetch_pool = ThreadPoolExecutor(
+            max_workers=8, thread_name_prefix="icloud-prefetch"
+        )
+        self._download_locks = {}
+        self._locks_guard = threading.Lock()
+        # Per-instance LRU: recently shown photos keep their resolved
+        # PhotoAsset around without holding the whole library in memory.
+        self._get_asset = functools.lru_cache(maxsize=64)(self._resolve_asset)
+        self._api = self._authenticate()
+        self.refresh()
+
+    def _authenticate(self):
+        from pyicloud import PyiCloudService
+
+        api = PyiCloudService(self.username)
+        if api.requires_2fa:
+            code = input("Enter the 2FA code sent to your device: ")
+            if not api.validate_2fa_code(code):
+                raise RuntimeError("Invalid 2FA code")
+        return api
+
+    def refresh(self) -> None:
+        """Fetch the photo list from iCloud, or reuse the cached copy.
+
+        pyicloud paginates the whole library for photos.all, which takes
+        tens of seconds for large libraries, so the (id, filename) list is
+        persisted next to the download cache and trusted for a few hours.
+        """
+        records = self._load_metadata()
+        if records is not None:
+            self._photos = [
+                _CachedPhoto(self, r["id"], r["filename"], r.get("url"), r.get("size"))
+                for r in records
+            ]
+            self._shuffle_order = []
+            logger.info("iCloud source: %d photos (from cache)", len(self._photos))
+            return
+
+        if self.album:
+            photos = self._api.photos.albums[self.album]
+        else:
+            photos = self._api.photos.all
+        # One pass over the paginated listing, keeping only a small
+        # descriptor per photo; holding every PhotoAsset for a 20k-photo
+        # library doesn't fit a small Pi. Grabbing the download URL here
+        # lets _download_photo skip the pyicloud wrapper (and its per-
+        # attribute requests) entirely.
+        records = []
+        for p in photos:
+            record = {"id": p.id, "filename": p.filename}
+            try:
+                original = p.versions["original"]
+                record["url"] = original.get("url")
+                record["size"] = original.get("size")
+            except (KeyError, AttributeError, TypeError):
+                pass
+            records.append(record)
+        self._photos = [
+            _CachedPhoto(self, r["id"], r["filename"], r.get("url"), r.get("size"))
+            for r in records
+        ]
+        self._save_metadata(records)
+        self._shuffle_order = []
+        logger.info("iCloud source: %d photos", len(self._photos))
+
+    def _load_metadata(self):
+        path = self.cache_path / "photos.json"
+        try:
+            if time.time() - path.stat().st_mtime >= _ICLOUD_METADATA_TTL:
+                return None
+            with path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_metadata(self, records) -> None:
+        path = self.cache_path / "photos.json"
+        tmp = path.with_name("photos.json.tmp")
+        try:
+            with tmp.open("w") as f:
+                json.dump(records, f)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.debug("Could not persist iCloud metadata: %s", exc)
+
+    def _resolve_asset(self, photo_id: str):
+        """Resolve a photo id back to a live PhotoAsset (LRU-cached as
+        ``_get_asset``)."""
+        if self.album:
+            photos = self._api.photos.albums[self.album]
+        else:
+            photos = self._api.photos.all
+        for photo in photos:
+            if photo.id == photo_id:
+                return photo
+        raise KeyError(f"Photo {photo_id} no longer in the iCloud library")
+
+    def get_photo_path(self, index: int) -> Path:
+        """Return a local path for the photo, downloading it on cache miss."""
+        photo = self._photos[index]
+        # Sharded git-style by id prefix: a flat directory with tens of
+        # thousands of entries makes every lookup a linear directory scan.
+        cache_file = self.cache_path / photo.id[:2] / f"{photo.id}.jpg"
+        if not cache_file.exists():
+            with self._lock_for(photo.id):
+                if not cache_file.exists():
+                    cache_file.parent.mkdir(parents=True, exist_ok=True)
+                    self._download_photo(photo, cache_file)
+        return cache_file
+
+    def _lock_for(self, photo_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._download_locks.setdefault(photo_id, threading.Lock())
+
+    def prefetch(self, indices) -> None:
+        """Warm the download cache for the given photo indices."""
+        for index in indices:
+            self._prefetch_pool.submit(self._prefetch_one, index)
+
+    def _prefetch_one(self, index: int) -> None:
+        try:
+            self.get_photo_path(index)
+        except Exception as exc:
+            logger.debug("Prefetch of photo %d failed: %s", index, exc)
+
+    def close(self) -> None:
+        """Stop background downloads."""
+        self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _download_photo(self, photo, dest: Path) -> None:
+        logger.info("Downloading %s from iCloud", photo.filename)
+        if getattr(photo, "url", None):
+            # Fetch the cached original URL straight through the session,
+            # bypassing asset re-resolution. URLs expire, so fall back to
+            # the pyicloud path on any failure.
+            try:
+                self._download_direct(photo.url, dest)
+                return
+            except Exception as exc:
+                logger.debug("Direct download failed, using asset: %s", exc)
+        download = photo.download()
+        part = dest.with_name(dest.name + ".part")
+        with part.open("wb") as f:
+            self._write_stream(download, f)
+        os.replace(part, dest)
+
+    def _download_direct(self, url: str, dest: Path) -> None:
+        """Resumable GET of ``url`` into ``dest``.
+
+        Response validators are written to the .meta.json sidecar before
+        the body is streamed, so an interrupted transfer leaves a .part
+        file plus an ETag and the next attempt resumes with Range/If-Range
+        instead of starting over. (We are only called when ``dest`` is
+        missing, so there is no revalidation path for complete files.)
+        """
+        part = dest.with_name(dest.name + ".part")
+        meta_path = dest.with_name(dest.name + ".meta.json")
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            meta = {}
+
+        headers = {}
+        offset = part.stat().st_size if part.exists() else 0
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if meta.get("etag"):
+                # If-Range restarts cleanly (200) when the asset changed.
+                headers["If-Range"] = meta["etag"]
+
+        response = self._api.session.get(url, stream=True, headers=headers)
+        response.raise_for_status()
+
+        # Persist the validators up front so a transfer interrupted
+        # mid-stream is resumable next time.
+        try:
+            meta_path.write_text(
+                json.dumps(
+                    {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "content_length": response.headers.get("Content-Length"),
+                    }
+                )
+            )
+        except OSError as exc:
+            logger.debug("Could not write download metadata: %s", exc)
+
+        # 206 appends to the partial file; anything else starts over.
+        with part.open("ab" if response.status_code == 206 else "wb") as f:
+            self._write_stream(response, f)
+        os.replace(part, dest)
+
+    @staticmethod
+    def _write_stream(download, f) -> None:
+        raw = getattr(download, "raw", None)
+        if raw is not None:
+            # One C-level copy loop with a 1 MiB buffer instead of a
+            # Python iteration per 8 KiB chunk.
+            raw.decode_content = True
+            shutil.copyfileobj(raw, f, length=1 << 20)
+        else:
+            for chunk in download.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+
+    def clear_cache(self) -> int:
+        """Delete all cached downloads; returns the number removed.
+
+        Keeps the photos.json listing — clearing photo bytes shouldn't
+        force a re-pagination of the library.
+        """
+        removed = 0
+        for entry in self.cache_path.iterdir():
+            if entry.is_dir():
+                removed += sum(1 for f in entry.iterdir() if f.suffix == ".jpg")
+                shutil.rmtree(entry)
+            elif entry.is_file() and entry.name != "photos.json":
+                if entry.suffix == ".jpg":
+                    removed += 1
+                entry.unlink()
+        return removed
+
+
+class CompositePhotoSource(PhotoSource):
+    """Presents several sources as a single pool of photos."""
+
+    def __init__(
+        self,
+        sources: list,
+        selection_mode: SelectionMode = SelectionMode.RANDOM,
+    ):
+        super().__init__(selection_mode)
+        self.sources = sources
+        self._source_offsets: list[tuple[PhotoSource, int]] = []
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        """Record each source's starting offset into the combined index."""
+        counts = [source.get_photo_count() for source in self.sources]
+        offsets = [0, *itertools.accumulate(counts)]
+        self._source_offsets = list(zip(self.sources, offsets[:-1]))
+        # Parallel arrays for bisect-based lookups.
+        self._sources_arr = self.sources
+        self._offsets_arr = offsets[:-1]
+        self._total_count = offsets[-1]
+
+    def _find_source_for_index(self, index: int):
+        """Map a combined index to (source, local_index) via bisect."""
+        i = bisect.bisect_right(self._offsets_arr, index) - 1
+        if i >= 0:
+            source = self._sources_arr[i]
+            local_index = index - self._offsets_arr[i]
+            if local_index < source.get_photo_count():
+                return source, local_index
+        raise IndexError(f"Photo index {index} out of range")
+
+    def refresh(self) -> None:
+        for source in self.sources:
+            source.refresh()
+        self._rebuild_index()
+        self._shuffle_order = []
+
+    def get_photo_count(self) -> int:
+        # Child indexes mutate live (watchdog events) without calling
+        # refresh() on the composite, so re-sum per call — it's one
+        # attribute read per source — and rebuild the offsets whenever
+        # the total moved. The base-class has_photos/select_photo_index
+        # go through here, so selections always see current offsets.
+        if sum(s.get_photo_count() for s in self.sources) != self._total_count:
+            self._rebuild_index()
+        return self._total_count
+
+    def get_photo_path(self, index: int) -> Path:
+        source, local_index = self._find_source_for_index(index)
+        return source.get_photo_path(local_index)
+
+    def close(self) -> None:
+        for source in self.sources:
+            source.close()
+
+
+def create_photo_sources(config) -> CompositePhotoSource:
+    """Build the configured photo sources from a Config."""
+    selection_mode = SelectionMode(config.photo.selection_mode)
+    sources = []
+    for name in config.photo.sources:
+        if name == "local":
+            sources.append(
+                LocalPhotoSource(config.photo.local_path, selection_mode)
+            )
+        elif name == "icloud":
+            sources.append(
+                ICloudPhotoSource(
+                    username=config.icloud.username,
+                    album=config.icloud.album,
+                    cache_dir=config.icloud.cache_dir,
+                    selection_mode=selection_mode,
+                )
+            )
+        else:
+            logger.warning("Unknown photo source %r, skipping", name)
+    return CompositePhotoSource(sources, selection_mode)